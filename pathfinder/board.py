@@ -3,8 +3,11 @@ from time import sleep
 from typing import List, TypeVar
 
 import noise
+import numpy as np
 import pygame
 
+from wavefront import wavefront_distance_map, wavefront_path
+
 # Colours
 WHITE_COLOUR, BLACK_COLOUR = (255, 255, 255), (0, 0, 0)
 RED_COLOUR, ORANGE_COLOUR = (255, 0, 0), (255, 165, 0)
@@ -28,6 +31,10 @@ AVAILABLE_ALGORITHMS = [
     "a_star_pathfind",
     "dijkstras_pathfinding"
 ]
+# Algorithms that accept the grid to run their array based fast mode
+FAST_MODE_ALGORITHMS = [
+    "dijkstras_pathfinding"
+]
 
 TNode = TypeVar("TNode", bound="Node")
 
@@ -271,6 +278,30 @@ class Board():
         return getattr(self.instance, name)
 
 
+def build_grid(traversable_rows: List[List[bool]]) -> List[List[TNode]]:
+    ''' Builds a grid of nodes detached from the board singleton.
+        Receives rows of traversable flags and returns the nodes
+        already linked to their adjacent and diagonal neighbours,
+        ready to be used by the pathfinding algorithms without
+        a graphic interface.'''
+    height = len(traversable_rows)
+    grid = [
+        [Node(None, y, x) for x in range(len(row))]
+        for y, row in enumerate(traversable_rows)]
+    for y, row in enumerate(traversable_rows):
+        for x, traversable in enumerate(row):
+            node = grid[y][x]
+            node.traversable = traversable
+            for y_offset, x_offset in [
+                    (-1, 0), (1, 0), (0, -1), (0, 1),
+                    (-1, -1), (1, 1), (1, -1), (-1, 1)]:
+                neighbour_y, neighbour_x = y + y_offset, x + x_offset
+                if 0 <= neighbour_y < height and\
+                        0 <= neighbour_x < len(grid[neighbour_y]):
+                    node.add_neighbour(grid[neighbour_y][neighbour_x])
+    return grid
+
+
 def euclidean_distance(
         start_coordinate: (int, int),
         goal_coordinate: (int, int)) -> float:
@@ -355,9 +386,17 @@ def a_star_search_neighbours(
     return open_set, False
 
 
-def dijkstras_pathfinding(start: TNode, goal: TNode) -> List[TNode]:
+def dijkstras_pathfinding(
+        start: TNode,
+        goal: TNode,
+        grid: List[List[TNode]] = None) -> List[TNode]:
     ''' Similar to a star pathfinding but without the
-        heuristic function '''
+        heuristic function.
+        If the grid holding the nodes is given, runs the fast
+        mode: distances are computed with the array based wavefront
+        engine and the search isn't drawn on board. '''
+    if grid is not None:
+        return dijkstras_wavefront_pathfinding(start, goal, grid)
     open_set = set()
     closed_set = set()
     start.parent_node = None
@@ -380,6 +419,32 @@ def dijkstras_pathfinding(start: TNode, goal: TNode) -> List[TNode]:
     return []
 
 
+def dijkstras_wavefront_pathfinding(
+        start: TNode,
+        goal: TNode,
+        grid: List[List[TNode]]) -> List[TNode]:
+    ''' Fast mode of dijkstras pathfinding. Expands the frontier
+        of all nodes at once over the grid traversable mask and
+        links the nodes of the shortest path by their parents. '''
+    traversable = np.array(
+        [[node.traversable for node in row] for row in grid])
+    traversable[start.get_coordinates()] = True
+    traversable[goal.get_coordinates()] = True
+    distances, predecessors = wavefront_distance_map(
+        traversable, start.get_coordinates(), goal.get_coordinates())
+    coordinates = wavefront_path(
+        distances, predecessors, goal.get_coordinates())
+    if not coordinates:
+        return []
+    start.parent_node = None
+    if len(coordinates) == 1:
+        ''' Start is the goal, there is no parent to follow '''
+        return [goal]
+    for child, parent in zip(coordinates, coordinates[1:]):
+        grid[child[0]][child[1]].add_parent(grid[parent[0]][parent[1]])
+    return extract_path(goal)
+
+
 def dijkstras_search_neighbours(
         q_node, goal, open_set, closed_set):
     ''' Search for selected node neighbours, calculate
@@ -409,6 +474,8 @@ def dijkstras_search_neighbours(
 
 def show_board(open_set, closed_list) -> None:
     ''' Show the board if there's already a board created '''
+    if not Board.instance:
+        return None
     board = Board(0, 0)
     for node in open_set:
         if board.start_node != node and\
@@ -0,0 +1,145 @@
+''' Checks the local pathfinding service end to end. Starts it on
+a free localhost port and talks to it like any other client. Run it
+with:
+    python3 pathfinder/check_service.py
+'''
+import asyncio
+import json
+import os
+
+from service import REQUEST_LINE_LIMIT, start_service
+
+# Search that takes long enough for identical queries to meet: A* has
+# to visit the whole board before finding the goal is walled off
+SLOW_ROWS = ["." * 120] * 118 + ["#" * 120, "." * 120]
+SLOW_QUERY = {
+    "op": "find_path", "board_id": "slow", "algorithm": "a_star_pathfind",
+    "start": [0, 0], "goals": [[119, 119]]}
+SMALL_ROWS = ["...", ".#.", "..."]
+
+
+async def request(port: int, message: dict) -> dict:
+    ''' Sends one request on its own connection and returns the answer '''
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+
+def path_query(board_id: str, start: list, goals: list) -> dict:
+    return {
+        "op": "find_path", "board_id": board_id,
+        "algorithm": "a_star_pathfind", "start": start, "goals": goals}
+
+
+async def check_coalescing(service, port: int) -> None:
+    ''' Identical queries running together share one computation '''
+    await request(port, {
+        "op": "load_board", "board_id": "slow", "rows": SLOW_ROWS})
+    computations = service.stats["computations"]
+    responses = await asyncio.gather(
+        *[request(port, SLOW_QUERY) for _ in range(4)])
+    assert all(response["ok"] for response in responses)
+    assert sorted(response["coalesced"] for response in responses) ==\
+        [False, True, True, True]
+    assert service.stats["computations"] == computations + 1
+    assert service.queue_depth == 0 and not service.in_flight
+
+
+async def check_reload(service, port: int) -> None:
+    ''' Reloading a board bumps its version and queries on the new
+        version don't join the ones still running on the old one '''
+    response = await request(port, {
+        "op": "load_board", "board_id": "reload", "rows": SLOW_ROWS})
+    assert response["version"] == 0
+    query = dict(SLOW_QUERY, board_id="reload")
+    old_version_query = asyncio.ensure_future(request(port, query))
+    await asyncio.sleep(0.1)
+    response = await request(port, {
+        "op": "load_board", "board_id": "reload", "rows": SLOW_ROWS})
+    assert response["version"] == 1
+    response = await request(port, query)
+    assert response["ok"] and not response["coalesced"]
+    assert (await old_version_query)["ok"]
+
+
+async def check_rejected_queries(service, port: int) -> None:
+    ''' Goals repeating the square before them and malformed
+        coordinates are answered with an error '''
+    await request(port, {
+        "op": "load_board", "board_id": "small", "rows": SMALL_ROWS})
+    for start, goals in [
+            ([0, 0], [[0, 0]]),
+            ([0, 0], [[2, 2], [2, 2]]),
+            ([True, 0], [[2, 2]]),
+            ([0, 0], [[3, 0]])]:
+        response = await request(port, path_query("small", start, goals))
+        assert not response["ok"], (start, goals)
+    response = await request(port, path_query("small", [0, 0], [[2, 2]]))
+    assert response["ok"] and response["path"][0] == [0, 0]
+    assert service.queue_depth == 0 and not service.in_flight
+
+
+async def check_bad_lines(service, port: int) -> None:
+    ''' Every request line is answered, even when it can't be decoded
+        or is longer than the limit '''
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"[" * 100000 + b"\n" + b'{"op": "stats"}\n')
+    await writer.drain()
+    assert not json.loads(await reader.readline())["ok"]
+    assert json.loads(await reader.readline())["ok"]
+    writer.write(b"." * (REQUEST_LINE_LIMIT + 1) + b"\n")
+    await writer.drain()
+    assert not json.loads(await reader.readline())["ok"]
+    assert await reader.readline() == b""
+    writer.close()
+    await writer.wait_closed()
+
+
+async def check_pool_recovery(service, port: int) -> None:
+    ''' A worker dying, while running a query or while the pool is
+        idle, fails only the queries it was running '''
+    await request(port, {
+        "op": "load_board", "board_id": "small", "rows": SMALL_ROWS})
+    try:
+        await service.run_coalesced(("crash",), os._exit, 1)
+        assert False, "the worker should have died"
+    except Exception as error:
+        assert type(error).__name__ == "BrokenProcessPool", error
+    response = await request(port, path_query("small", [0, 0], [[2, 2]]))
+    assert response["ok"]
+
+    service.executor.submit(os._exit, 1)
+    await asyncio.sleep(0.5)
+    response = await request(port, path_query("small", [0, 0], [[2, 0]]))
+    assert response["ok"]
+    assert service.queue_depth == 0 and not service.in_flight
+
+
+CHECKS = [
+    check_coalescing,
+    check_reload,
+    check_rejected_queries,
+    check_bad_lines,
+    check_pool_recovery
+]
+
+
+async def run_checks() -> None:
+    service, server = await start_service(0, 2)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        for check in CHECKS:
+            await check(service, port)
+            print("ok:", check.__name__)
+    finally:
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_checks())
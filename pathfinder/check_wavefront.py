@@ -0,0 +1,149 @@
+''' Checks the wavefront engine against a heap based Dijkstra's
+algorithm on a few fixed boards. Run it with:
+    python3 pathfinder/check_wavefront.py
+'''
+import heapq
+from typing import List
+
+import numpy as np
+
+import wavefront
+from board import build_grid, dijkstras_pathfinding, euclidean_distance
+from wavefront import MOVES, wavefront_distance_map, wavefront_path
+
+
+def random_rows(size: int, seed: int) -> List[str]:
+    ''' Seeded board with about 30% of obstacles and free corners,
+        wide enough for the frontier to leave the heap relaxation '''
+    random_state = np.random.RandomState(seed)
+    rows = [
+        "".join("#" if value < 0.3 else "." for value in row)
+        for row in random_state.rand(size, size)]
+    rows[0] = "." + rows[0][1:]
+    rows[-1] = rows[-1][:-1] + "."
+    return rows
+
+
+# Boards with their start and goal. On rows "#" marks an obstacle
+BOARDS = {
+    "open": ([
+        "......",
+        "......",
+        "......",
+        "......"], (0, 0), (3, 5)),
+    "scattered obstacles": ([
+        "..#.....",
+        ".##..#..",
+        "....#...",
+        "#..#..#.",
+        "..#...#.",
+        "....#..."], (0, 0), (5, 7)),
+    "serpentine": ([
+        ".......",
+        "######.",
+        ".......",
+        ".######",
+        ".......",
+        "######.",
+        "......."], (0, 0), (6, 0)),
+    "goal improved after first reached": ([
+        "#...",
+        ".#.#",
+        ".#.#",
+        "...#"], (1, 2), (2, 0)),
+    "goal improved after first popped neighbour": ([
+        "......",
+        "#.....",
+        ".##...",
+        "#.....",
+        "...#..",
+        ".#....",
+        "......",
+        ".#.#..",
+        "......",
+        "..##..",
+        "......",
+        "..#.#."], (7, 4), (1, 1)),
+    "unreachable goal": ([
+        "....#...",
+        "....#...",
+        "....#...",
+        "....#..."], (1, 1), (2, 6)),
+    "walled start": ([
+        ".....",
+        ".###.",
+        ".#.#.",
+        ".###.",
+        "....."], (2, 2), (4, 4)),
+    "start is goal": ([
+        "...",
+        "...",
+        "..."], (1, 1), (1, 1)),
+    "seeded obstacles": (random_rows(80, 7), (0, 0), (79, 79))
+}
+
+
+def heap_dijkstra(traversable: np.ndarray, start: (int, int)) -> np.ndarray:
+    ''' Reference distance map, visiting squares by a heap '''
+    height, width = traversable.shape
+    distances = np.full((height, width), np.inf)
+    distances[start] = 0
+    heap = [(0, start)]
+    while heap:
+        distance, coordinate = heapq.heappop(heap)
+        if distance > distances[coordinate]:
+            continue
+        for y_move, x_move in MOVES:
+            neighbour = (coordinate[0] + y_move, coordinate[1] + x_move)
+            if not (0 <= neighbour[0] < height and 0 <= neighbour[1] < width)\
+                    or not traversable[neighbour]:
+                continue
+            new_distance = distance + euclidean_distance(coordinate, neighbour)
+            if new_distance < distances[neighbour]:
+                distances[neighbour] = new_distance
+                heapq.heappush(heap, (new_distance, neighbour))
+    return distances
+
+
+def path_length(path: List[tuple]) -> float:
+    return sum(
+        euclidean_distance(first, second)
+        for first, second in zip(path, path[1:]))
+
+
+def check_board(name: str, rows: List[str], start, goal) -> None:
+    ''' Compares the full distance map, the early stopped search
+        and the fast mode of dijkstras pathfinding on a board '''
+    traversable = np.array([[symbol != "#" for symbol in row] for row in rows])
+    expected = heap_dijkstra(traversable, start)
+
+    distances, predecessors = wavefront_distance_map(traversable, start)
+    assert np.array_equal(np.isinf(distances), np.isinf(expected)), name
+    reached = np.isfinite(expected)
+    assert np.allclose(distances[reached], expected[reached]), name
+
+    distances, predecessors = wavefront_distance_map(
+        traversable, start, goal)
+    path = wavefront_path(distances, predecessors, goal)
+    if np.isinf(expected[goal]):
+        assert path == [], name
+    else:
+        assert np.isclose(distances[goal], expected[goal]), name
+        assert path[0] == goal and path[-1] == start, name
+        assert all(traversable[coordinate] for coordinate in path), name
+        assert np.isclose(path_length(path), expected[goal]), name
+
+    grid = build_grid(traversable.tolist())
+    nodes = dijkstras_pathfinding(
+        grid[start[0]][start[1]], grid[goal[0]][goal[1]], grid)
+    assert [node.get_coordinates() for node in nodes] == path, name
+
+
+if __name__ == "__main__":
+    ''' Every board is checked as shipped and again with array
+        expansions only, so both ways of relaxing are covered '''
+    small_frontier = wavefront.SMALL_FRONTIER
+    for wavefront.SMALL_FRONTIER in (small_frontier, 0):
+        for name, (rows, start, goal) in BOARDS.items():
+            check_board(name, rows, start, goal)
+            print("ok:", name, "small frontier", wavefront.SMALL_FRONTIER)
@@ -0,0 +1,430 @@
+''' Local pathfinding service.
+Serves the pathfinding algorithms to other processes without the
+graphic interface. Clients connect to localhost and exchange one JSON
+object per line.
+
+Available operations:
+    {"op": "load_board", "board_id": "b1", "rows": ["..#", "...", "#.."]}
+    {"op": "find_path", "board_id": "b1", "algorithm": "a_star_pathfind",
+     "start": [0, 0], "goals": [[2, 2]]}
+    {"op": "distance_map", "board_id": "b1", "start": [0, 0]}
+    {"op": "stats"}
+
+On rows "#" marks an obstacle and "." a free square. Coordinates are
+(y, x) like everywhere else on the board.
+'''
+import argparse
+import asyncio
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from time import perf_counter
+from typing import List, Tuple
+
+import numpy as np
+
+import board
+from board import AVAILABLE_ALGORITHMS, FAST_MODE_ALGORITHMS, build_grid
+from wavefront import wavefront_distance_map, wavefront_path
+
+# Network
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+
+# Board rows symbols
+OBSTACLE_SYMBOL, FREE_SYMBOL = "#", "."
+
+# Limits, a request line must fit the largest board rows
+MAX_BOARD_DIMENSION = 2000
+REQUEST_LINE_LIMIT = MAX_BOARD_DIMENSION * (MAX_BOARD_DIMENSION + 4) + 4096
+
+
+def board_traversable_mask(
+        rows: Tuple[str, ...],
+        special_coordinates: Tuple[Tuple[int, int], ...]) -> List[List[bool]]:
+    ''' Converts the board rows to traversable flags. Special
+        squares are never obstacles, like on the board. '''
+    traversable = [
+        [symbol != OBSTACLE_SYMBOL for symbol in row] for row in rows]
+    for special in special_coordinates:
+        traversable[special[0]][special[1]] = True
+    return traversable
+
+
+def run_path_query(
+        algorithm: str,
+        rows: Tuple[str, ...],
+        start: Tuple[int, int],
+        goals: Tuple[Tuple[int, int], ...]) -> List[Tuple[int, int]]:
+    ''' Runs on a worker process and visits each goal in order, like
+        the play button does. Algorithms with a fast mode search the
+        traversable mask directly, the others a fresh grid of nodes.
+        Returns the coordinates from start to the last goal or an empty
+        list if any goal is unreachable. '''
+    traversable = board_traversable_mask(rows, (start,) + goals)
+    if algorithm in FAST_MODE_ALGORITHMS:
+        find_leg = partial(wavefront_leg, np.array(traversable))
+    else:
+        find_leg = partial(node_loop_leg, build_grid(traversable), algorithm)
+    path = []
+    partial_start = start
+    for goal in goals:
+        path_found = find_leg(partial_start, goal)
+        if not path_found:
+            return []
+        ''' Paths come from goal to start, the partial start is
+            already the last coordinate of the path '''
+        path_found = path_found[::-1]
+        path += path_found if not path else path_found[1:]
+        partial_start = goal
+    return path
+
+
+def wavefront_leg(
+        traversable: np.ndarray,
+        start: Tuple[int, int],
+        goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+    ''' Coordinates from goal back to start found by the
+        wavefront engine '''
+    distances, predecessors = wavefront_distance_map(
+        traversable, start, goal)
+    return wavefront_path(distances, predecessors, goal)
+
+
+def node_loop_leg(
+        grid: List[List[board.Node]],
+        algorithm: str,
+        start: Tuple[int, int],
+        goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+    ''' Coordinates from goal back to start found by the
+        given algorithm over the grid of nodes '''
+    pathfind = getattr(board, algorithm)
+    path_found = pathfind(grid[start[0]][start[1]], grid[goal[0]][goal[1]])
+    return [node.get_coordinates() for node in path_found]
+
+
+def run_distance_map_query(
+        rows: Tuple[str, ...],
+        start: Tuple[int, int]) -> 'EncodedJSON':
+    ''' Runs on a worker process. Returns the distance from start
+        to every square already encoded, with null on unreachable
+        squares, so large maps aren't encoded on the event loop. '''
+    traversable = np.array(board_traversable_mask(rows, (start,)))
+    distances, _ = wavefront_distance_map(traversable, start)
+    distances = np.where(np.isinf(distances), np.nan, distances)
+    return EncodedJSON(json.dumps(distances.tolist()).replace("NaN", "null"))
+
+
+class EncodedJSON(str):
+    ''' JSON text placed as it is on a response '''
+
+
+def encode_response(response: dict) -> bytes:
+    ''' Encodes a response as a JSON line, appending the values
+        already encoded without decoding them again '''
+    encoded_values = {
+        key: value for key, value in response.items()
+        if isinstance(value, EncodedJSON)}
+    text = json.dumps({
+        key: value for key, value in response.items()
+        if key not in encoded_values})
+    for key, value in encoded_values.items():
+        text = "{}, {}: {}}}".format(text[:-1], json.dumps(key), value)
+    return (text + "\n").encode()
+
+
+class PathfindingService():
+    ''' Keeps the loaded boards and dispatches path queries
+        to a pool of worker processes. Identical queries that
+        are still running share a single computation. '''
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.executor = self.new_executor()
+        self.boards = {}
+        self.in_flight = {}
+        self.queue_depth = 0
+        self.stats = {
+            "requests": 0,
+            "computations": 0,
+            "coalesced": 0,
+            "errors": 0,
+            "total_latency_ms": 0.0,
+            "max_latency_ms": 0.0
+        }
+
+    async def handle_client(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter) -> None:
+        ''' Answers each JSON line received from a client
+            until it closes the connection '''
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    ''' The rest of a line too long can't be told
+                        apart from the next request, so the client
+                        is answered and disconnected '''
+                    self.stats["requests"] += 1
+                    self.stats["errors"] += 1
+                    response = {
+                        "ok": False,
+                        "error": "request longer than {} bytes".format(
+                            REQUEST_LINE_LIMIT)}
+                    writer.write(encode_response(response))
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                response = await self.dispatch(line)
+                writer.write(encode_response(response))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, line: bytes) -> dict:
+        ''' Decodes a request, runs the chosen operation and
+            returns the response with the request latency '''
+        start_time = perf_counter()
+        self.stats["requests"] += 1
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+            operation = request.get("op")
+            if operation == "load_board":
+                response = self.load_board(request)
+            elif operation == "find_path":
+                response = await self.find_path(request)
+            elif operation == "distance_map":
+                response = await self.distance_map(request)
+            elif operation == "stats":
+                response = self.report_stats()
+            else:
+                raise ValueError("unknown op: {}".format(operation))
+            response["ok"] = True
+        except (ValueError, TypeError, KeyError) as error:
+            self.stats["errors"] += 1
+            response = {"ok": False, "error": str(error)}
+        except BrokenProcessPool:
+            self.stats["errors"] += 1
+            response = {"ok": False, "error": "worker process failed"}
+        except Exception as error:
+            ''' Anything else, like a request nested too deep to
+                decode or a failure inside a worker, still gets an
+                answer instead of dropping the client '''
+            self.stats["errors"] += 1
+            response = {
+                "ok": False,
+                "error": "{}: {}".format(type(error).__name__, error)}
+        latency_ms = (perf_counter() - start_time) * 1000
+        self.stats["total_latency_ms"] += latency_ms
+        self.stats["max_latency_ms"] = max(
+            self.stats["max_latency_ms"], latency_ms)
+        response["latency_ms"] = latency_ms
+        return response
+
+    def load_board(self, request: dict) -> dict:
+        ''' Stores the board rows under the given id. Reloading an
+            id replaces the board and bumps its version, so running
+            queries on the old board are not shared with new ones. '''
+        board_id = str(request["board_id"])
+        rows = request["rows"]
+        if not rows or not isinstance(rows, list) or\
+                not all(isinstance(row, str) for row in rows):
+            raise ValueError("rows must be a non empty list of strings")
+        if len(set(len(row) for row in rows)) != 1 or not rows[0]:
+            raise ValueError("rows must have the same non zero length")
+        if max(len(rows), len(rows[0])) > MAX_BOARD_DIMENSION:
+            raise ValueError("boards are limited to {0}x{0} squares".format(
+                MAX_BOARD_DIMENSION))
+        if set("".join(rows)) - {OBSTACLE_SYMBOL, FREE_SYMBOL}:
+            raise ValueError("rows may only contain '{}' and '{}'".format(
+                OBSTACLE_SYMBOL, FREE_SYMBOL))
+        version = self.boards[board_id][0] + 1\
+            if board_id in self.boards else 0
+        self.boards[board_id] = (version, tuple(rows))
+        return {
+            "board_id": board_id,
+            "version": version,
+            "height": len(rows),
+            "width": len(rows[0])
+        }
+
+    async def find_path(self, request: dict) -> dict:
+        ''' Runs the chosen algorithm from start through every goal
+            on a worker process. If an identical query is already
+            running its result is awaited instead. '''
+        board_id = str(request["board_id"])
+        if board_id not in self.boards:
+            raise ValueError("unknown board: {}".format(board_id))
+        algorithm = request["algorithm"]
+        if algorithm not in AVAILABLE_ALGORITHMS:
+            raise ValueError("unknown algorithm: {}".format(algorithm))
+        version, rows = self.boards[board_id]
+        start = self.parse_coordinate(request["start"], rows)
+        goals = tuple(
+            self.parse_coordinate(goal, rows) for goal in request["goals"])
+        if not goals:
+            raise ValueError("at least one goal is needed")
+        for partial_start, goal in zip((start,) + goals, goals):
+            ''' The algorithms can't search from a square to itself,
+                like the board never lets a goal be a special square '''
+            if goal == partial_start:
+                raise ValueError(
+                    "goal repeats the square before it: {}".format(
+                        list(goal)))
+
+        response = await self.run_coalesced(
+            (board_id, version, algorithm, start, goals),
+            run_path_query, algorithm, rows, start, goals)
+        path = response.pop("result")
+        response["path"] = [list(coordinate) for coordinate in path]
+        response["found"] = bool(path)
+        return response
+
+    async def distance_map(self, request: dict) -> dict:
+        ''' Computes on a worker process the distance from start to
+            every square of the board with the wavefront engine '''
+        board_id = str(request["board_id"])
+        if board_id not in self.boards:
+            raise ValueError("unknown board: {}".format(board_id))
+        version, rows = self.boards[board_id]
+        start = self.parse_coordinate(request["start"], rows)
+        response = await self.run_coalesced(
+            (board_id, version, "distance_map", start),
+            run_distance_map_query, rows, start)
+        response["distances"] = response.pop("result")
+        return response
+
+    async def run_coalesced(self, key: tuple, query, *arguments) -> dict:
+        ''' Submits the query to the worker pool unless an identical
+            one, with the same key, is already running. Returns the
+            result, if it was coalesced and the queue depth found. '''
+        queue_depth = self.queue_depth
+        future = self.in_flight.get(key)
+        coalesced = future is not None
+        if coalesced:
+            self.stats["coalesced"] += 1
+        else:
+            executor, future = self.submit(query, *arguments)
+            self.in_flight[key] = future
+            self.queue_depth += 1
+            self.stats["computations"] += 1
+            future.add_done_callback(
+                lambda done: self.finish_query(key, done, executor))
+        ''' Shielded so a client leaving does not cancel the
+            computation other clients may be waiting for '''
+        result = await asyncio.shield(future)
+        return {
+            "result": result,
+            "coalesced": coalesced,
+            "queue_depth": queue_depth
+        }
+
+    def submit(self, query, *arguments) -> tuple:
+        ''' Runs the query on the worker pool and returns the pool used
+            with the query future. A pool whose worker died while idle
+            refuses new work, so it's replaced and the query retried
+            once on the new pool. '''
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            return executor, loop.run_in_executor(executor, query, *arguments)
+        except BrokenProcessPool:
+            self.replace_executor(executor)
+        executor = self.executor
+        return executor, loop.run_in_executor(executor, query, *arguments)
+
+    def new_executor(self) -> ProcessPoolExecutor:
+        ''' Workers are spawned instead of forked, otherwise they would
+            keep open the client connections of the moment they start,
+            and clients would never see the service closing them '''
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"))
+
+    def replace_executor(self, executor: ProcessPoolExecutor) -> None:
+        ''' Replaces a broken worker pool, unless another query
+            already did it '''
+        if self.executor is executor:
+            executor.shutdown(wait=False)
+            self.executor = self.new_executor()
+
+    def finish_query(
+            self,
+            key: tuple,
+            future: asyncio.Future,
+            executor: ProcessPoolExecutor) -> None:
+        ''' Forgets a finished computation. If its worker died the
+            pool can't run anything else, so it's replaced. '''
+        del self.in_flight[key]
+        self.queue_depth -= 1
+        if not future.cancelled() and\
+                isinstance(future.exception(), BrokenProcessPool):
+            self.replace_executor(executor)
+
+    def parse_coordinate(
+            self,
+            coordinate: list,
+            rows: Tuple[str, ...]) -> Tuple[int, int]:
+        ''' Validates a (y, x) coordinate against the board rows '''
+        if not isinstance(coordinate, list) or len(coordinate) != 2 or\
+                not all(isinstance(value, int) and
+                        not isinstance(value, bool) for value in coordinate):
+            raise ValueError("coordinates must be [y, x] integers")
+        y_coordinate, x_coordinate = coordinate
+        if not (0 <= y_coordinate < len(rows) and
+                0 <= x_coordinate < len(rows[0])):
+            raise ValueError("coordinate out of board: {}".format(coordinate))
+        return (y_coordinate, x_coordinate)
+
+    def report_stats(self) -> dict:
+        ''' Returns the counters gathered since the service started '''
+        stats = dict(self.stats)
+        stats["queue_depth"] = self.queue_depth
+        stats["boards"] = len(self.boards)
+        stats["mean_latency_ms"] = stats["total_latency_ms"] /\
+            max(stats["requests"], 1)
+        return stats
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+async def start_service(
+        port: int,
+        workers: int) -> Tuple[PathfindingService, asyncio.AbstractServer]:
+    ''' Starts the service on localhost. Port 0 picks a free port. '''
+    service = PathfindingService(workers)
+    server = await asyncio.start_server(
+        service.handle_client, HOST, port, limit=REQUEST_LINE_LIMIT)
+    return service, server
+
+
+async def serve(port: int, workers: int) -> None:
+    ''' Starts the service on localhost and serves until cancelled '''
+    service, server = await start_service(port, workers)
+    print("Pathfinding service listening on {}:{}".format(HOST, port))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    arguments = parser.parse_args()
+    try:
+        asyncio.run(serve(arguments.port, arguments.workers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,167 @@
+''' Array based wavefront engine.
+Computes whole board distance maps for uniform cost boards by
+expanding the frontier of every square at once with NumPy arrays
+over the traversable mask, instead of visiting node by node.
+
+Each expansion only relaxes the neighbours of the squares improved
+on the last one, so the work follows the frontier instead of the
+whole board. Narrow frontiers, like the corridors of a maze, are
+relaxed square by square with a heap, where an array expansion
+would cost more than the few squares it moves.
+'''
+import heapq
+from typing import Tuple
+
+import numpy as np
+
+# 8-connected moves (y, x) and their costs, same as the euclidean
+# distance used between neighbour nodes
+MOVES = np.array([
+    (-1, 0), (1, 0), (0, -1), (0, 1),
+    (-1, -1), (1, 1), (1, -1), (-1, 1)])
+MOVE_COSTS = np.array([1, 1, 1, 1] + [2 ** (1/2)] * 4)
+NO_PREDECESSOR = -1
+# Frontiers up to this size are cheaper to relax square by square
+SMALL_FRONTIER = 32
+
+
+def wavefront_distance_map(
+        traversable: np.ndarray,
+        start_coordinate: (int, int),
+        goal_coordinate: (int, int) = None) -> Tuple[np.ndarray, np.ndarray]:
+    ''' Receives a boolean mask of traversable squares and a start
+        coordinate (y, x). Returns the distance map from start, with
+        infinity on unreachable squares, and the predecessor grid,
+        holding for each square the index on MOVES of the move that
+        reached it or NO_PREDECESSOR.
+        If a goal coordinate is given the expansion stops as soon as
+        the goal distance can't improve anymore, so only squares
+        closer than the goal are sure to have their final distance. '''
+    height, width = traversable.shape
+    ''' Distances live flattened inside an infinite border, so the
+        neighbours of any square are fixed index offsets and the
+        border is never traversable '''
+    padded_width = width + 2
+    padded = np.full((height + 2, padded_width), np.inf)
+    padded_traversable = np.zeros(padded.shape, dtype=bool)
+    padded_traversable[1:-1, 1:-1] = traversable
+    flat_distances = padded.ravel()
+    flat_traversable = padded_traversable.ravel()
+    ''' Scratch used to keep each neighbour once, the last position
+        written for a square is the only one that reads back '''
+    stamps = np.empty(padded.size, dtype=np.int64)
+    offsets = MOVES[:, 0] * padded_width + MOVES[:, 1]
+    start_index = flat_index(start_coordinate, padded_width)
+    flat_distances[start_index] = 0
+    goal_index = None if goal_coordinate is None else\
+        flat_index(goal_coordinate, padded_width)
+    frontier = np.array([start_index])
+    while frontier.size:
+        if frontier.size <= SMALL_FRONTIER:
+            frontier = relax_small_frontier(
+                flat_distances, flat_traversable, offsets, frontier,
+                goal_index)
+            continue
+        ''' Only traversable neighbours of the squares improved on
+            the last expansion may improve now. Each one takes the
+            best distance offered by its own neighbours. '''
+        squares = (frontier[:, np.newaxis] + offsets).ravel()
+        squares = squares[flat_traversable[squares]]
+        positions = np.arange(squares.size)
+        stamps[squares] = positions
+        squares = squares[stamps[squares] == positions]
+        best_distances = np.full(squares.shape, np.inf)
+        for offset, cost in zip(offsets, MOVE_COSTS):
+            np.minimum(
+                best_distances, flat_distances[squares - offset] + cost,
+                out=best_distances)
+        improved = best_distances < flat_distances[squares]
+        frontier = squares[improved]
+        flat_distances[frontier] = best_distances[improved]
+        if goal_index is not None and frontier.size and\
+                best_distances[improved].min() >= flat_distances[goal_index]:
+            ''' Every later improvement comes from a square farther
+                than the goal, so the goal distance is final '''
+            break
+    return padded[1:-1, 1:-1], wavefront_predecessors(padded)
+
+
+def relax_small_frontier(
+        flat_distances: np.ndarray,
+        flat_traversable: np.ndarray,
+        offsets: np.ndarray,
+        frontier: np.ndarray,
+        goal_index: int = None) -> np.ndarray:
+    ''' Relaxes the squares of a small frontier one by one, closest
+        first, like a heap based Dijkstra. Narrow corridors keep the
+        frontier this small for thousands of expansions, where each
+        array expansion would cost more than its few squares.
+        Returns the squares still to be relaxed once they are too many,
+        or nothing when done or when the goal distance is final. '''
+    moves = list(zip(offsets.tolist(), MOVE_COSTS.tolist()))
+    heap = [(flat_distances[square], square) for square in frontier.tolist()]
+    heapq.heapify(heap)
+    while heap and len(heap) <= SMALL_FRONTIER:
+        distance, square = heapq.heappop(heap)
+        if distance > flat_distances[square]:
+            continue
+        if goal_index is not None and distance >= flat_distances[goal_index]:
+            return np.array([], dtype=int)
+        for offset, cost in moves:
+            neighbour = square + offset
+            if flat_traversable[neighbour] and\
+                    distance + cost < flat_distances[neighbour]:
+                flat_distances[neighbour] = distance + cost
+                heapq.heappush(heap, (distance + cost, neighbour))
+    return np.unique(np.array([square for _, square in heap], dtype=int))
+
+
+def wavefront_predecessors(padded: np.ndarray) -> np.ndarray:
+    ''' Builds the predecessor grid from the padded distance map.
+        Each reached square keeps the move coming from the neighbour
+        its distance was taken from. Moves are compared one at a time
+        so only one candidate grid is alive at once. '''
+    height, width = padded.shape[0] - 2, padded.shape[1] - 2
+    distances = padded[1:-1, 1:-1]
+    best_distances = np.full((height, width), np.inf)
+    predecessors = np.full((height, width), NO_PREDECESSOR, dtype=np.int8)
+    candidates = np.empty((height, width))
+    better = np.empty((height, width), dtype=bool)
+    for i, ((y_move, x_move), cost) in enumerate(zip(MOVES, MOVE_COSTS)):
+        np.add(
+            padded[
+                1 - y_move:1 - y_move + height,
+                1 - x_move:1 - x_move + width],
+            cost, out=candidates)
+        np.less(candidates, best_distances, out=better)
+        np.copyto(best_distances, candidates, where=better)
+        np.copyto(predecessors, np.int8(i), where=better)
+    ''' Start and unreachable squares come from nowhere '''
+    predecessors[
+        np.isinf(distances) | (best_distances > distances)] = NO_PREDECESSOR
+    return predecessors
+
+
+def flat_index(coordinate: (int, int), padded_width: int) -> int:
+    ''' Index of a board coordinate (y, x) on the flattened
+        distances with their border '''
+    return (coordinate[0] + 1) * padded_width + coordinate[1] + 1
+
+
+def wavefront_path(
+        distances: np.ndarray,
+        predecessors: np.ndarray,
+        goal_coordinate: (int, int)) -> list:
+    ''' Follows the predecessor grid from goal back to the
+        start and returns the coordinates (y, x) on that order.
+        Returns an empty list if the goal wasn't reached. '''
+    coordinate = tuple(goal_coordinate)
+    if np.isinf(distances[coordinate]):
+        return []
+    path = [coordinate]
+    while predecessors[coordinate] != NO_PREDECESSOR:
+        y_move, x_move = MOVES[predecessors[coordinate]]
+        coordinate = (
+            int(coordinate[0] - y_move), int(coordinate[1] - x_move))
+        path.append(coordinate)
+    return path